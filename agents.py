@@ -1,9 +1,205 @@
 # agents.py
-from typing import List, Dict, Any
+import asyncio
+import functools
+import hashlib
+import threading
+from string import Template
+from typing import List, Dict, Any, AsyncIterator
 import google.generativeai as genai
+import orjson
+from cachetools import TTLCache
 from config import AgentConfig, APIConfig
-from tools import WebResearchTool, EnhancedYFinanceTools
-import json
+from tools import WebResearchTool, EnhancedYFinanceTools, HTTP_SESSION
+
+# Gemini responses keyed by model + formatted prompt. Prompts embed the scraped
+# data, so a hit means the same question about the same data within the hour
+_RESPONSE_CACHE = TTLCache(maxsize=256, ttl=3600)
+# Streamlit sessions run on their own threads and TTLCache isn't thread-safe
+_RESPONSE_CACHE_LOCK = threading.Lock()
+
+def _cached_response(key: str):
+    """Cached response text for a key, or None"""
+    with _RESPONSE_CACHE_LOCK:
+        return _RESPONSE_CACHE.get(key)
+
+def _cache_response(key: str, text: str):
+    """Store response text under a key"""
+    with _RESPONSE_CACHE_LOCK:
+        _RESPONSE_CACHE[key] = text
+
+_CONFIGURED = False
+
+def _configure_genai():
+    """Validate the API key and configure Gemini, once per process"""
+    global _CONFIGURED
+    if not _CONFIGURED:
+        APIConfig.validate_keys()
+        genai.configure(api_key=APIConfig.GOOGLE_API_KEY)
+        _CONFIGURED = True
+
+@functools.lru_cache(maxsize=8)
+def get_model(model_name: str, temperature: float, max_tokens: int) -> genai.GenerativeModel:
+    """Get the shared Gemini model for a configuration
+    
+    Agents with the same configuration reuse one model and its underlying client
+    instead of each building their own.
+    """
+    _configure_genai()
+    return genai.GenerativeModel(
+        model_name=model_name,
+        generation_config={
+            "temperature": temperature,
+            "max_output_tokens": max_tokens
+        }
+    )
+
+def _to_prompt(obj: Any) -> str:
+    """Serialize data for a prompt as key-sorted JSON
+    
+    Sorted keys keep the prompt text, and so the response cache key, stable for
+    the same data.
+    """
+    return orjson.dumps(
+        obj,
+        option=orjson.OPT_SORT_KEYS | orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS,
+        default=str
+    ).decode()
+
+# Metrics worth carrying into the synthesis prompt - the sub-agents have
+# already read the full data, the advisor only needs the headline numbers
+_SUMMARY_FUNDAMENTALS = [
+    "Market Cap (intraday)",
+    "PE Ratio (TTM)",
+    "EPS (TTM)",
+    "Beta (5Y Monthly)",
+    "52 Week Range",
+    "Forward Dividend & Yield"
+]
+_SUMMARY_RATIOS = [
+    "Forward P/E",
+    "PEG Ratio (5yr expected)",
+    "Price/Book (mrq)",
+    "Profit Margin",
+    "Return on Equity (ttm)",
+    "Total Debt/Equity (mrq)"
+]
+_SUMMARY_TECHNICALS = ["rsi", "macd", "macd_signal", "sma_50", "sma_200"]
+
+def _summarize_for_prompt(data: Dict[str, Any]) -> str:
+    """Compact metrics table for the synthesis prompt
+    
+    Args:
+        data: The gather_analyses result.
+        
+    Returns:
+        str: One "- label: value" line per available metric, plus the top 3
+            news headlines.
+    """
+    financials = data.get("financials", {})
+    financial_data = financials.get("financial_data", {})
+    fundamentals = financials.get("fundamentals", {})
+    ratios = financials.get("key_ratios", {})
+    technical = data.get("technicals", {}).get("technical_data", {}).get("technical", {})
+    news = data.get("web_research", {}).get("news_data") or []
+    
+    metrics = []
+    if "current_price" in financial_data:
+        metrics.append(("Current Price", financial_data["current_price"]))
+    metrics += [(key, fundamentals[key]) for key in _SUMMARY_FUNDAMENTALS if key in fundamentals]
+    metrics += [(key, ratios[key]) for key in _SUMMARY_RATIOS if key in ratios]
+    metrics += [(key.upper(), technical[key]) for key in _SUMMARY_TECHNICALS if key in technical]
+    metrics += [("Headline", article.get("title", "")) for article in news[:3]]
+    
+    return "\n".join(f"- {label}: {value}" for label, value in metrics)
+
+# Prompt templates, built once at import
+AGENT_PROMPT = Template("""Instructions: $instructions
+
+Query: $prompt
+
+Please provide a detailed analysis based on the above instructions.""")
+
+WEB_RESEARCH_PROMPT = Template("""
+Analyze the following news articles about $company:
+
+$news_data
+
+Provide insights on:
+1. Recent developments
+2. Market sentiment
+3. Key challenges and opportunities
+4. Competitive position
+""")
+
+FINANCIAL_PROMPT = Template("""
+Analyze the following financial data for $symbol:
+
+Financial Overview:
+$financial_data
+
+Provide detailed insights on:
+1. Financial health and stability
+2. Growth trends and projections
+3. Valuation metrics and fair value assessment
+4. Key risk factors and considerations
+5. Comparative industry analysis
+6. Capital structure and efficiency
+7. Profitability metrics and trends
+8. Dividend sustainability (if applicable)
+""")
+
+TECHNICAL_PROMPT = Template("""
+Analyze the following technical indicators for $symbol:
+
+$technical_data
+
+Provide insights on:
+1. Trend analysis
+2. Support and resistance levels
+3. Technical signals
+4. Trading recommendations
+""")
+
+RECOMMENDATION_PROMPT = Template("""
+Synthesize the following analyses for $symbol:
+
+Web Research: $web_research
+Financial Analysis: $financials
+Technical Analysis: $technicals
+
+Key Metrics:
+$metrics
+
+Provide:
+1. Overall recommendation (Buy/Hold/Sell)
+2. Key reasons for recommendation
+3. Risk factors
+4. Price targets
+5. Investment timeline
+""")
+
+SINGLE_SHOT_PROMPT = Template("""
+Analyze $symbol using the following data.
+
+News Articles:
+$news_data
+
+Financial Data:
+$financial_data
+
+Technical Indicators:
+$technical_data
+
+Respond with a JSON object with these keys, each a markdown string:
+- "market_research": recent developments, market sentiment, key challenges
+  and opportunities, competitive position
+- "financial": financial health, growth, valuation, risks, capital structure,
+  profitability and dividend sustainability
+- "technical": trend, support and resistance levels, technical signals,
+  trading recommendations
+- "recommendation": overall recommendation (Buy/Hold/Sell), key reasons,
+  risk factors, price targets and investment timeline
+""")
 
 class BaseAgent:
     """Base agent class with common functionality"""
@@ -13,62 +209,110 @@ class BaseAgent:
         self.instructions = instructions
         self._setup_model()
         
+    def set_instructions(self, instructions: List[str]):
+        """Replace the analysis instructions without rebuilding the model"""
+        self.instructions = list(instructions)
+        
     def _setup_model(self):
         """Initialize the Gemini model"""
-        # Validate API keys before setup
-        APIConfig.validate_keys()
-        
-        # Configure Gemini with the API key
-        genai.configure(api_key=APIConfig.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel(
-            model_name=self.config.model_name,
-            generation_config={
-                "temperature": self.config.temperature,
-                "max_output_tokens": self.config.max_tokens
-            }
+        self.model = get_model(
+            self.config.model_name,
+            self.config.temperature,
+            self.config.max_tokens
         )
         
     async def generate_response(self, prompt: str) -> str:
         """Generate response using the model"""
         try:
             formatted_prompt = self._format_prompt(prompt)
+            key = self._cache_key(formatted_prompt)
+            cached = _cached_response(key)
+            if cached is not None:
+                return cached
+            
             response = await self.model.generate_content_async(formatted_prompt)
+            _cache_response(key, response.text)
             return response.text
         except Exception as e:
             print(f"Error generating response: {str(e)}")
             return ""
             
+    async def generate_response_stream(self, prompt: str) -> AsyncIterator[str]:
+        """Generate response using the model, yielding text chunks as they arrive"""
+        try:
+            formatted_prompt = self._format_prompt(prompt)
+            key = self._cache_key(formatted_prompt)
+            cached = _cached_response(key)
+            if cached is not None:
+                yield cached
+                return
+            
+            chunks = []
+            response = await self.model.generate_content_async(formatted_prompt, stream=True)
+            async for chunk in response:
+                chunks.append(chunk.text)
+                yield chunk.text
+            _cache_response(key, "".join(chunks))
+        except Exception as e:
+            print(f"Error streaming response: {str(e)}")
+            
+    async def generate_json_response(self, prompt: str, max_tokens: int = None) -> Dict[str, Any]:
+        """Generate a JSON object response using the model"""
+        try:
+            formatted_prompt = self._format_prompt(prompt)
+            key = self._cache_key(f"json\n{formatted_prompt}")
+            cached = _cached_response(key)
+            if cached is not None:
+                return orjson.loads(cached)
+            
+            response = await self.model.generate_content_async(
+                formatted_prompt,
+                generation_config={
+                    "response_mime_type": "application/json",
+                    "max_output_tokens": max_tokens or self.config.max_tokens
+                }
+            )
+            # Parse before caching so a truncated response isn't replayed
+            result = orjson.loads(response.text)
+            _cache_response(key, response.text)
+            return result
+        except Exception as e:
+            print(f"Error generating JSON response: {str(e)}")
+            return {}
+            
+    def _cache_key(self, formatted_prompt: str) -> str:
+        """Response cache key for a formatted prompt on this agent's model"""
+        return hashlib.sha1(
+            f"{self.config.model_name}\n{formatted_prompt}".encode()
+        ).hexdigest()
+            
     def _format_prompt(self, prompt: str) -> str:
         """Format prompt with instructions"""
-        return f"""Instructions: {' '.join(self.instructions)}
-
-Query: {prompt}
-
-Please provide a detailed analysis based on the above instructions."""
+        return AGENT_PROMPT.substitute(
+            instructions=' '.join(self.instructions),
+            prompt=prompt
+        )
 
 class WebResearchAgent(BaseAgent):
     """Agent for web research and news analysis"""
     
     def __init__(self, config: AgentConfig, instructions: List[str]):
         super().__init__(config, instructions)
-        self.web_tool = WebResearchTool()
+        self.web_tool = WebResearchTool(session=HTTP_SESSION)
+        
+    async def collect_news(self, company: str) -> List[Dict[str, Any]]:
+        """Fetch the raw news articles without analyzing them"""
+        return await self.web_tool.search_news_async(company)
         
     async def research_company(self, company: str) -> Dict[str, Any]:
         """Perform comprehensive web research"""
         
-        news_data = self.web_tool.search_news(company)
-        
-        analysis_prompt = f"""
-        Analyze the following news articles about {company}:
+        news_data = await self.collect_news(company)
         
-        {news_data}
-        
-        Provide insights on:
-        1. Recent developments
-        2. Market sentiment
-        3. Key challenges and opportunities
-        4. Competitive position
-        """
+        analysis_prompt = WEB_RESEARCH_PROMPT.substitute(
+            company=company,
+            news_data=_to_prompt(news_data)
+        )
         
         analysis = await self.generate_response(analysis_prompt)
         return {
@@ -90,50 +334,21 @@ class FinancialDataAgent(BaseAgent):
             "stock_fundamentals": True
         })
         
+    async def collect_financials(self, symbol: str) -> Dict[str, Any]:
+        """Fetch the raw financial data without analyzing it"""
+        # One call scrapes the quote pages concurrently and hands back dictionaries
+        return await asyncio.to_thread(self.finance_tool.get_all, symbol)
+        
     async def analyze_financials(self, symbol: str) -> Dict[str, Any]:
         """Analyze company financials"""
-        financial_data = self.finance_tool.get_stock_data(symbol)
-        
-        # Parse JSON strings into dictionaries
-        try:
-            fundamentals = json.loads(self.finance_tool.get_stock_fundamentals(symbol))
-        except:
-            fundamentals = {}
-            
-        try:
-            ratios = json.loads(self.finance_tool.get_key_financial_ratios(symbol))
-        except:
-            ratios = {}
-        
-        # Combine all financial information
-        combined_data = {
-            **financial_data,
-            "fundamentals": fundamentals,
-            "key_ratios": ratios
-        }
-        
-        analysis_prompt = f"""
-        Analyze the following financial data for {symbol}:
-        
-        Financial Overview:
-        {combined_data}
-        
-        Stock Fundamentals:
-        {fundamentals}
+        combined_data = await self.collect_financials(symbol)
+        fundamentals = combined_data["fundamentals"]
+        ratios = combined_data["key_ratios"]
         
-        Key Financial Ratios:
-        {ratios}
-        
-        Provide detailed insights on:
-        1. Financial health and stability
-        2. Growth trends and projections
-        3. Valuation metrics and fair value assessment
-        4. Key risk factors and considerations
-        5. Comparative industry analysis
-        6. Capital structure and efficiency
-        7. Profitability metrics and trends
-        8. Dividend sustainability (if applicable)
-        """
+        analysis_prompt = FINANCIAL_PROMPT.substitute(
+            symbol=symbol,
+            financial_data=_to_prompt(combined_data)
+        )
         
         analysis = await self.generate_response(analysis_prompt)
         return {
@@ -142,6 +357,7 @@ class FinancialDataAgent(BaseAgent):
             "key_ratios": ratios,
             "analysis": analysis
         }
+
 class TechnicalAnalysisAgent(BaseAgent):
     """Agent for technical analysis"""
     
@@ -152,21 +368,18 @@ class TechnicalAnalysisAgent(BaseAgent):
             "historical_prices": True
         })
         
+    async def collect_technicals(self, symbol: str) -> Dict[str, Any]:
+        """Fetch the raw technical indicators without analyzing them"""
+        return await asyncio.to_thread(self.finance_tool.get_stock_data, symbol)
+        
     async def analyze_technicals(self, symbol: str) -> Dict[str, Any]:
         """Perform technical analysis"""
-        technical_data = self.finance_tool.get_stock_data(symbol)
-        
-        analysis_prompt = f"""
-        Analyze the following technical indicators for {symbol}:
-        
-        {technical_data}
+        technical_data = await self.collect_technicals(symbol)
         
-        Provide insights on:
-        1. Trend analysis
-        2. Support and resistance levels
-        3. Technical signals
-        4. Trading recommendations
-        """
+        analysis_prompt = TECHNICAL_PROMPT.substitute(
+            symbol=symbol,
+            technical_data=_to_prompt(technical_data)
+        )
         
         analysis = await self.generate_response(analysis_prompt)
         return {
@@ -183,33 +396,106 @@ class StockAdvisorAgent(BaseAgent):
         self.financial = FinancialDataAgent(config, instructions)
         self.technical = TechnicalAnalysisAgent(config, instructions)
         
-    async def generate_recommendation(self, symbol: str) -> Dict[str, Any]:
-        """Generate comprehensive stock recommendation"""
-        # Gather data from all agents
-        web_research = await self.web_research.research_company(symbol)
-        financials = await self.financial.analyze_financials(symbol)
-        technicals = await self.technical.analyze_technicals(symbol)
-        
-        recommendation_prompt = f"""
-        Synthesize the following analyses for {symbol}:
-        
-        Web Research: {web_research}
-        Financial Analysis: {financials}
-        Technical Analysis: {technicals}
-        
-        Provide:
-        1. Overall recommendation (Buy/Hold/Sell)
-        2. Key reasons for recommendation
-        3. Risk factors
-        4. Price targets
-        5. Investment timeline
-        """
+    def set_instructions(self, instructions: List[str]):
+        """Replace the instructions of this agent and of every sub-agent"""
+        super().set_instructions(instructions)
+        for agent in (self.web_research, self.financial, self.technical):
+            agent.set_instructions(instructions)
+        
+    async def gather_analyses(self, symbol: str) -> Dict[str, Any]:
+        """Run the research, financial and technical agents for a symbol"""
+        # Gather data from all agents concurrently - they don't depend on each other
+        results = await asyncio.gather(
+            self.web_research.research_company(symbol),
+            self.financial.analyze_financials(symbol),
+            self.technical.analyze_technicals(symbol),
+            return_exceptions=True
+        )
         
-        final_recommendation = await self.generate_response(recommendation_prompt)
+        # A failing agent shouldn't sink the whole report
+        web_research, financials, technicals = [
+            self._empty_result(name, result) if isinstance(result, Exception) else result
+            for name, result in zip(("web research", "financial", "technical"), results)
+        ]
         
         return {
             "web_research": web_research,
             "financials": financials,
-            "technicals": technicals,
+            "technicals": technicals
+        }
+        
+    async def generate_recommendation(self, symbol: str) -> Dict[str, Any]:
+        """Generate comprehensive stock recommendation"""
+        analyses = await self.gather_analyses(symbol)
+        final_recommendation = await self.generate_response(
+            self._recommendation_prompt(symbol, analyses)
+        )
+        
+        return {
+            **analyses,
             "recommendation": final_recommendation
-        }
\ No newline at end of file
+        }
+        
+    async def generate_recommendation_single_shot(self, symbol: str) -> Dict[str, Any]:
+        """Generate the same report as generate_recommendation with one Gemini call
+        
+        The raw data is collected from the three agents' tools without any model
+        calls, then a single JSON-mode generation writes all four sections.
+        """
+        news_data, financial_data, technical_data = await asyncio.gather(
+            self.web_research.collect_news(symbol),
+            self.financial.collect_financials(symbol),
+            self.technical.collect_technicals(symbol)
+        )
+        
+        prompt = SINGLE_SHOT_PROMPT.substitute(
+            symbol=symbol,
+            news_data=_to_prompt(news_data),
+            financial_data=_to_prompt(financial_data),
+            technical_data=_to_prompt(technical_data)
+        )
+        
+        # Four sections in one response, so allow four responses' worth of tokens
+        sections = await self.generate_json_response(prompt, max_tokens=self.config.max_tokens * 4)
+        
+        def section(key: str) -> str:
+            value = sections.get(key, "")
+            return value if isinstance(value, str) else _to_prompt(value)
+        
+        return {
+            "web_research": {
+                "news_data": news_data,
+                "analysis": section("market_research")
+            },
+            "financials": {
+                "financial_data": financial_data,
+                "fundamentals": financial_data.get("fundamentals", {}),
+                "key_ratios": financial_data.get("key_ratios", {}),
+                "analysis": section("financial")
+            },
+            "technicals": {
+                "technical_data": technical_data,
+                "analysis": section("technical")
+            },
+            "recommendation": section("recommendation")
+        }
+        
+    def stream_recommendation(self, symbol: str, analyses: Dict[str, Any]) -> AsyncIterator[str]:
+        """Stream the final recommendation for analyses from gather_analyses"""
+        return self.generate_response_stream(self._recommendation_prompt(symbol, analyses))
+        
+    def _recommendation_prompt(self, symbol: str, analyses: Dict[str, Any]) -> str:
+        """Build the synthesis prompt from the sub-agent results"""
+        return RECOMMENDATION_PROMPT.substitute(
+            symbol=symbol,
+            web_research=analyses['web_research'].get('analysis', ''),
+            financials=analyses['financials'].get('analysis', ''),
+            technicals=analyses['technicals'].get('analysis', ''),
+            metrics=_summarize_for_prompt(analyses)
+        )
+    
+    @staticmethod
+    def _empty_result(name: str, error: Exception) -> Dict[str, Any]:
+        """Placeholder for an agent that raised, so the synthesis prompt still renders"""
+        print(f"Error in {name} agent: {str(error)}")
+        return {"analysis": ""}
\ No newline at end of file
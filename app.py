@@ -1,96 +1,16 @@
 import streamlit as st
 import asyncio
+import re
+import threading
+from pathlib import Path
+from string import Template
 from config import (
     STOCK_ADVISOR_CONFIG,
-    APIConfig
+    SINGLE_SHOT_RECOMMENDATION
 )
 from agents import StockAdvisorAgent
 import json
 
-# Custom CSS styles
-custom_css = """
-<style>
-    /* Main container styling */
-    .main {
-        padding: 2rem;
-    }
-    
-    /* Custom card styling */
-    .stcard {
-        background-color: #ffffff;
-        border-radius: 10px;
-        padding: 1.5rem;
-        box-shadow: 0 4px 6px rgba(0, 0, 0, 0.1);
-        margin-bottom: 1.5rem;
-    }
-    
-    /* Metric styling */
-    .metric-container {
-        background-color: #f8f9fa;
-        border-radius: 8px;
-        padding: 1rem;
-        margin: 0.5rem 0;
-    }
-    
-    .metric-label {
-        color: #6c757d;
-        font-size: 0.9rem;
-        font-weight: 500;
-    }
-    
-    .metric-value {
-        color: #212529;
-        font-size: 1.2rem;
-        font-weight: 600;
-    }
-    
-    /* Header styling */
-    h1, h2, h3 {
-        color: #1a1a1a;
-        margin-bottom: 1rem;
-    }
-    
-    /* Sidebar styling */
-    .sidebar .sidebar-content {
-        background-color: #f8f9fa;
-    }
-    
-    /* Button styling */
-    .stButton > button {
-        background-color: #007bff;
-        color: white;
-        border: none;
-        border-radius: 5px;
-        padding: 0.5rem 1rem;
-        transition: background-color 0.3s;
-    }
-    
-    .stButton > button:hover {
-        background-color: #0056b3;
-    }
-    
-    /* Analysis sections styling */
-    .analysis-section {
-        border-left: 4px solid #007bff;
-        padding-left: 1rem;
-        margin: 1rem 0;
-    }
-    
-    /* Status indicators */
-    .status-positive {
-        color: #28a745;
-    }
-    
-    .status-negative {
-        color: #dc3545;
-    }
-    
-    .status-neutral {
-        color: #ffc107;
-    }
-</style>
-"""
-
 # Page configuration
 st.set_page_config(
     page_title="AI Stock Advisor Pro",
@@ -99,8 +19,24 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Inject custom CSS
-st.markdown(custom_css, unsafe_allow_html=True)
+STATIC_DIR = Path(__file__).parent / "static"
+
+METRIC_CARD_TEMPLATE = Template("""
+<div class="metric-container">
+    <div class="metric-label">$label</div>
+    <div class="metric-value">$value</div>
+    $description
+</div>
+""")
+
+# Yahoo symbols: letters/digits with optional class (BRK-B), exchange suffix
+# (RELIANCE.NS) or index/currency markers (^GSPC, EURUSD=X)
+SYMBOL_PATTERN = re.compile(r"^\^?[A-Z0-9]{1,10}([.\-][A-Z0-9]{1,4})?(=[A-Z])?$")
+
+@st.cache_resource
+def load_static(name):
+    """Read a static asset once per process"""
+    return (STATIC_DIR / name).read_text(encoding="utf-8")
 
 def initialize_session_state():
     """Initialize session state variables"""
@@ -112,33 +48,70 @@ def initialize_session_state():
         ]
     
     if 'advisor_agent' not in st.session_state:
-        APIConfig.validate_keys()  
         st.session_state.advisor_agent = StockAdvisorAgent(
             config=STOCK_ADVISOR_CONFIG,
             instructions=st.session_state.analysis_instructions
         )
 
+@st.cache_resource
+def get_event_loop():
+    """One event loop for the whole process, running in a daemon thread.
+    
+    The Gemini async client is process-wide and bound to the loop that first
+    uses it, so every session submits its work to this same loop.
+    """
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name="async-loop", daemon=True).start()
+    return loop
+
+def run_async(coro):
+    """Run a coroutine on the shared event loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coro, get_event_loop()).result()
+
+_STREAM_END = object()
+
+async def _next_chunk(async_gen):
+    """Next item of an async generator, or _STREAM_END once it is exhausted"""
+    try:
+        return await async_gen.__anext__()
+    except StopAsyncIteration:
+        return _STREAM_END
+
+def iterate_async(async_gen):
+    """Drive an async generator on the shared loop from the synchronous Streamlit script"""
+    while True:
+        chunk = run_async(_next_chunk(async_gen))
+        if chunk is _STREAM_END:
+            break
+        yield chunk
+
 def create_metric_card(label, value, description=""):
     """Create a custom styled metric card"""
-    html = f"""
-    <div class="metric-container">
-        <div class="metric-label">{label}</div>
-        <div class="metric-value">{value}</div>
-        {f'<div class="metric-description">{description}</div>' if description else ''}
-    </div>
-    """
+    html = METRIC_CARD_TEMPLATE.substitute(
+        label=label,
+        value=value,
+        description=f'<div class="metric-description">{description}</div>' if description else ''
+    )
     return st.markdown(html, unsafe_allow_html=True)
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_report(symbol, web, fin, tech, rec):
+    """Assemble the downloadable markdown report, cached across reruns"""
+    return "".join([
+        f"# AI Stock Advisor Pro Report - {symbol}\n\n",
+        "## Market Research\n", web, "\n\n",
+        "## Financial Analysis\n", fin, "\n\n",
+        "## Technical Analysis\n", tech, "\n\n",
+        "## Final Recommendation\n", rec, "\n"
+    ])
+
 def main():
+    # Inject custom CSS - Streamlit drops elements that a rerun doesn't emit,
+    # so the styles go out every run but are only read from disk once
+    st.markdown(f"<style>\n{load_static('styles.css')}</style>", unsafe_allow_html=True)
+    
     # Header section with improved styling
-    st.markdown("""
-    <div style="text-align: center; padding: 2rem 0;">
-        <h1 style="color: #007bff;">🤖 AI Stock Advisor Pro</h1>
-        <p style="font-size: 1.2rem; color: #6c757d;">
-            Advanced stock analysis powered by AI agents
-        </p>
-    </div>
-    """, unsafe_allow_html=True)
+    st.markdown(load_static('header.html'), unsafe_allow_html=True)
     
     # Initialize session state
     initialize_session_state()
@@ -173,9 +146,8 @@ def main():
             if st.button("Add Instruction", use_container_width=True):
                 if new_instruction:
                     st.session_state.analysis_instructions.append(new_instruction)
-                    st.session_state.advisor_agent = StockAdvisorAgent(
-                        config=STOCK_ADVISOR_CONFIG,
-                        instructions=st.session_state.analysis_instructions
+                    st.session_state.advisor_agent.set_instructions(
+                        st.session_state.analysis_instructions
                     )
                     st.experimental_rerun()
         
@@ -185,9 +157,8 @@ def main():
                     "Synthesize data from financial, technical, and market research agents",
                     "Provide comprehensive stock analysis and recommendations"
                 ]
-                st.session_state.advisor_agent = StockAdvisorAgent(
-                    config=STOCK_ADVISOR_CONFIG,
-                    instructions=st.session_state.analysis_instructions
+                st.session_state.advisor_agent.set_instructions(
+                    st.session_state.analysis_instructions
                 )
                 st.experimental_rerun()
         
@@ -202,9 +173,8 @@ def main():
             
             if st.button("Remove Selected Instruction", use_container_width=True):
                 st.session_state.analysis_instructions.pop(instruction_to_remove)
-                st.session_state.advisor_agent = StockAdvisorAgent(
-                    config=STOCK_ADVISOR_CONFIG,
-                    instructions=st.session_state.analysis_instructions
+                st.session_state.advisor_agent.set_instructions(
+                    st.session_state.analysis_instructions
                 )
                 st.experimental_rerun()
         
@@ -217,12 +187,28 @@ def main():
             if not symbol:
                 st.error("Please enter a stock symbol")
                 return
+            
+            # Reject typos before spending any Gemini / Yahoo / NewsAPI calls
+            symbol = symbol.strip().upper()
+            if not SYMBOL_PATTERN.match(symbol):
+                st.error(f"'{symbol}' is not a valid stock symbol")
+                return
                 
             with st.spinner("🔄 Generating comprehensive analysis..."):
                 try:
-                    result = asyncio.run(
-                        st.session_state.advisor_agent.generate_recommendation(symbol)
-                    )
+                    agent = st.session_state.advisor_agent
+                    if SINGLE_SHOT_RECOMMENDATION:
+                        result = run_async(
+                            agent.generate_recommendation_single_shot(symbol)
+                        )
+                    else:
+                        # The recommendation itself is streamed into the main area below
+                        result = run_async(
+                            agent.gather_analyses(symbol)
+                        )
+                        result['recommendation'] = None
+                    # Later reruns must use the analysed symbol, not the live text box
+                    result['symbol'] = symbol
                     st.session_state.latest_analysis = result
                     st.success("✅ Analysis completed successfully!")
                 except Exception as e:
@@ -322,31 +308,28 @@ def main():
         
         with st.container():
             st.markdown("### Summary")
-            st.markdown(result['recommendation'])
+            if result['recommendation'] is None:
+                result['recommendation'] = st.write_stream(iterate_async(
+                    st.session_state.advisor_agent.stream_recommendation(result['symbol'], result)
+                )) or ""
+            else:
+                st.markdown(result['recommendation'])
             
             # Improved download button
-            full_report = f"""
-            # AI Stock Advisor Pro Report - {symbol}
-            
-            ## Market Research
-            {result['web_research']['analysis']}
-            
-            ## Financial Analysis
-            {result['financials']['analysis']}
-            
-            ## Technical Analysis
-            {result['technicals']['analysis']}
-            
-            ## Final Recommendation
-            {result['recommendation']}
-            """
+            full_report = build_report(
+                result['symbol'],
+                result['web_research']['analysis'],
+                result['financials']['analysis'],
+                result['technicals']['analysis'],
+                result['recommendation']
+            )
             
             col1, col2, col3 = st.columns([1, 2, 1])
             with col2:
                 st.download_button(
                     label="📥 Download Full Report",
                     data=full_report,
-                    file_name=f"stock_analysis_{symbol}.md",
+                    file_name=f"stock_analysis_{result['symbol']}.md",
                     mime="text/markdown",
                     use_container_width=True
                 )
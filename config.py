@@ -30,6 +30,10 @@ class APIConfig:
                 "You can get an API key from https://makersuite.google.com/app/apikey"
             )
 
+# Feature flags
+# Write the whole report in one Gemini call instead of one call per agent plus a synthesis
+SINGLE_SHOT_RECOMMENDATION: bool = os.getenv("SINGLE_SHOT_RECOMMENDATION", "").lower() in ("1", "true", "yes")
+
 # Agent-specific configurations
 WEB_RESEARCH_CONFIG = AgentConfig(
     model_name="gemini-1.5-flash",
@@ -1,19 +1,236 @@
 # tools.py
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+import asyncio
+import atexit
+import copy
+import functools
+import logging
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 import pandas as pd
 import requests
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from pathlib import Path
+import lxml.html
+from lxml import etree
+from cachetools import TTLCache
 from newsapi import NewsApiClient
 from config import APIConfig
 import json 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional - without it tool output is encoded with json
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Scraped data is shared by every tool instance for 15 minutes, so re-running an
+# analysis for the same symbol doesn't hit Yahoo / NewsAPI again
+_DATA_CACHE = TTLCache(maxsize=128, ttl=900)
+# Parsed quote pages, kept briefly so scrapers reading the same page share
+# one download and parse
+_DOM_CACHE = TTLCache(maxsize=32, ttl=60)
+# One fetch lock per page while someone holds it, so concurrent scrapers of a
+# page wait for a single fetch; entries vanish once no thread references them
+_DOM_FETCH_LOCKS = weakref.WeakValueDictionary()
+# Ticker -> company name barely ever changes, so keep it for a day
+_COMPANY_NAME_CACHE = TTLCache(maxsize=1024, ttl=86400)
+_CACHE_LOCK = threading.Lock()
+
+def _ttl_cached(cache: TTLCache, complete=None):
+    """Cache a tool method's result in a shared TTL cache.
+    
+    The key is the method name, the instance's tool config (if any) and the call
+    arguments. Only complete results are stored, so a failed fetch is retried on
+    the next call. complete(self, result) decides what counts as complete; by
+    default any non-empty result does. Every caller gets its own deep copy, so
+    mutating a result never touches the cached entry.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            config = tuple(sorted(getattr(self, 'config', {}).items()))
+            key = (func.__qualname__, config, *args, *sorted(kwargs.items()))
+            with _CACHE_LOCK:
+                cached = cache.get(key)
+            if cached is not None:
+                return copy.deepcopy(cached)
+            
+            result = func(self, *args, **kwargs)
+            if complete(self, result) if complete else result:
+                with _CACHE_LOCK:
+                    cache[key] = copy.deepcopy(result)
+            return result
+        return wrapper
+    return decorator
+
+def _ewma(values: np.ndarray, alpha: float) -> np.ndarray:
+    """Exponential moving average, same as pandas ewm(alpha=alpha, adjust=False).mean()"""
+    # A year of daily bars is a few hundred steps - plain floats keep it cheap
+    result = values.tolist()
+    for i in range(1, len(result)):
+        result[i] = alpha * result[i] + (1 - alpha) * result[i - 1]
+    return np.array(result, dtype=np.float64)
+
+# Flat 100-day placeholder history, built once and shared read-only
+_FALLBACK_HISTORY = {
+    'date': np.datetime64('today', 'D') - np.arange(99, -1, -1),
+    'close': np.full(100, 100.0),
+    'volume': np.full(100, 1000000.0)
+}
+for _values in _FALLBACK_HISTORY.values():
+    _values.setflags(write=False)
+del _values
+
+def _fallback_history() -> Dict[str, np.ndarray]:
+    """Placeholder history for when Yahoo has no usable data"""
+    # A fresh dict over the shared, read-only arrays
+    return dict(_FALLBACK_HISTORY)
+
+# Scraped history table headers holding numbers, matched by prefix since some
+# carry footnote text ("Close Close price adjusted for splits.")
+_NUMERIC_HEADERS = ('Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume')
+_NUMBER_TRANS = str.maketrans('', '', ',')
+
+def _parse_number(text: str) -> float:
+    """Parse a scraped number like '1,234.50' - '-' reads as 0, anything else invalid as NaN"""
+    if text == '-':
+        return 0.0
+    try:
+        return float(text.translate(_NUMBER_TRANS))
+    except ValueError:
+        return np.nan
+
+# Scraped history table column -> history array key
+_HISTORY_COLUMNS = {
+    'Date': 'date',
+    'Open': 'open',
+    'High': 'high',
+    'Low': 'low',
+    'Close': 'close',
+    'Adj Close': 'adj_close',
+    'Volume': 'volume'
+}
+
+def _frame_to_history(df: pd.DataFrame) -> Dict[str, np.ndarray]:
+    """Convert a scraped history table to the array dict the history fetch returns"""
+    return {
+        key: df[column].to_numpy(dtype='datetime64[s]' if key == 'date' else np.float64)
+        for column, key in _HISTORY_COLUMNS.items() if column in df.columns
+    }
+
+def _to_json(obj: Any) -> str:
+    """Indented JSON text for tool output"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode()
+    return json.dumps(obj, indent=2)
+
+def _parse_html(response: requests.Response) -> lxml.html.HtmlElement:
+    """Parse a page with lxml's C parser, letting it detect the encoding"""
+    return lxml.html.fromstring(response.content)
+
+def _fetch_tree(session: requests.Session, symbol: str, page: str = '') -> Optional[lxml.html.HtmlElement]:
+    """Parsed Yahoo quote page for a symbol, or None if it could not be loaded.
+    
+    page is the subpage path ('' for the summary page). The tree is shared
+    through _DOM_CACHE, so callers must only read from it.
+    """
+    key = (symbol, page)
+    with _CACHE_LOCK:
+        fetch_lock = _DOM_FETCH_LOCKS.get(key)
+        if fetch_lock is None:
+            fetch_lock = _DOM_FETCH_LOCKS[key] = threading.Lock()
+    
+    with fetch_lock:
+        with _CACHE_LOCK:
+            tree = _DOM_CACHE.get(key)
+        if tree is not None:
+            return tree
+        
+        url = f"https://finance.yahoo.com/quote/{symbol}/{page}".rstrip('/')
+        response = session.get(url, timeout=_YAHOO_TIMEOUT)
+        if response.status_code != 200:
+            return None
+        
+        tree = _parse_html(response)
+        with _CACHE_LOCK:
+            _DOM_CACHE[key] = tree
+        return tree
+
+def _first(element: lxml.html.HtmlElement, xpath):
+    """First node matching an XPath (string or compiled) relative to element, or None"""
+    found = xpath(element) if isinstance(xpath, etree.XPath) else element.xpath(xpath)
+    return found[0] if found else None
+
+def _text(element: lxml.html.HtmlElement) -> str:
+    """Stripped text content of an element and its descendants"""
+    return element.text_content().strip()
+
+def _has_class(name: str) -> str:
+    """XPath predicate matching one class token, like BeautifulSoup's class filter"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+# Seconds to wait on a Yahoo connect or read, so a hung request can't hold a
+# worker (or a page's fetch lock) indefinitely
+_YAHOO_TIMEOUT = 10
+
+# On-disk HTTP cache lifetimes, first match wins. Prices move, profiles and
+# statements change at most daily
+_URLS_EXPIRE_AFTER = {
+    'finance.yahoo.com/quote/*/profile*': timedelta(days=1),
+    'finance.yahoo.com/quote/*/financials*': timedelta(days=1),
+    'finance.yahoo.com/quote/*/key-statistics*': timedelta(days=1),
+    'finance.yahoo.com/quote/*/analysis*': timedelta(days=1),
+    'finance.yahoo.com/quote/*/history*': timedelta(hours=12),
+    'finance.yahoo.com/quote/*': timedelta(seconds=60),
+    'query1.finance.yahoo.com/v8/finance/chart/*range=1d*': timedelta(seconds=60),
+    'query1.finance.yahoo.com/v8/finance/chart/*': timedelta(hours=12),
+    'newsapi.org/*': timedelta(hours=1)
+}
+
+def _build_session() -> requests.Session:
+    """Keep-alive session with pooled connections, retries, gzip responses and
+    an on-disk response cache that survives restarts"""
+    session = requests_cache.CachedSession(
+        # Next to this module, not in whatever directory the app was started from
+        str(Path(__file__).parent / 'yahoo_cache'),
+        backend='sqlite',
+        expire_after=timedelta(hours=12),
+        urls_expire_after=_URLS_EXPIRE_AFTER
+    )
+    session.headers.update({
+        "User-Agent": "Mozilla/5.0",
+        "Accept-Encoding": "gzip"
+    })
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(total=3, backoff_factor=0.3)
+    )
+    session.mount("https://", adapter)
+    return session
+
+# One keep-alive session shared by the tools, so repeat lookups reuse open
+# connections instead of paying a new TLS handshake each time
+HTTP_SESSION = _build_session()
+atexit.register(HTTP_SESSION.close)
 
 class WebResearchTool:
     """Custom web research tool implementation"""
     
-    def __init__(self):
-        self.news_api = NewsApiClient(api_key=APIConfig.NEWS_API_KEY)
+    _H1_XP = etree.XPath('//h1')
+    
+    def __init__(self, session: requests.Session = None):
+        self.session = session or HTTP_SESSION
+        self.news_api = NewsApiClient(api_key=APIConfig.NEWS_API_KEY, session=self.session)
         
+    @_ttl_cached(_DATA_CACHE)
     def search_news(self, query: str, days: int = 7) -> List[Dict[str, Any]]:
         """Search recent news articles"""
         try:
@@ -22,7 +239,8 @@ class WebResearchTool:
             # Get company name from Yahoo Finance
             try:
                 company_name = self._get_company_name(query)
-            except:
+            except Exception as e:
+                logger.warning("company name lookup failed for %s: %s", query, e)
                 company_name = query
             
             response = self.news_api.get_everything(
@@ -36,252 +254,277 @@ class WebResearchTool:
             print(f"Error fetching news: {str(e)}")
             return []
     
+    async def search_news_async(self, query: str, days: int = 7) -> List[Dict[str, Any]]:
+        """Async variant of search_news for callers already on an event loop"""
+        return await asyncio.to_thread(self.search_news, query, days)
+    
     def _get_company_name(self, ticker: str) -> str:
-        """Get company name from Yahoo Finance"""
-        url = f"https://finance.yahoo.com/quote/{ticker}"
-        headers = {
-            "User-Agent": "Mozilla/5.0"
-        }
-        
-        response = requests.get(url, headers=headers)
-        
-        if response.status_code != 200:
-            return ticker
+        """Get company name from Yahoo Finance, falling back to the ticker"""
+        return self._fetch_company_name(ticker) or ticker
+    
+    @_ttl_cached(_COMPANY_NAME_CACHE)
+    def _fetch_company_name(self, ticker: str) -> str:
+        """Company name from the Yahoo quote page's <h1>, or '' if unavailable"""
+        tree = _fetch_tree(self.session, ticker)
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        if tree is None:
+            return ''
         
         # Find the company name
-        h1_element = soup.find('h1')
-        if h1_element:
-            return h1_element.text.strip()
+        h1_element = _first(tree, self._H1_XP)
+        if h1_element is not None:
+            return _text(h1_element)
         
-        return ticker
+        return ''
 
 class EnhancedYFinanceTools:
-    """Enhanced Finance tools with BeautifulSoup web scraping"""
+    """Enhanced Finance tools with lxml web scraping"""
+    
+    # XPaths are compiled once here and reused for every page scraped
+    _PRICE_XP = etree.XPath('//fin-streamer[@data-field="regularMarketPrice"]')
+    _PROFILE_NAME_XP = etree.XPath('//section[@data-testid="asset-profile"]//h3')
+    _ADDRESS_XP = etree.XPath(f'//div[{_has_class("address")}]')
+    _PHONE_XP = etree.XPath('//a[@aria-label="phone number"]')
+    _WEBSITE_XP = etree.XPath('//a[@aria-label="website link"]')
+    _DESCRIPTION_XP = etree.XPath('//section[@data-testid="description"]//p')
+    # Text of the first <tag> after the first <dt> whose text contains $label -
+    # how the profile page lays out sector, industry and employee count
+    _DT_VALUE_XP = etree.XPath(
+        'normalize-space((//dt[contains(., $label)])[1]/following::*[name() = $tag][1])'
+    )
+    _TABLE_XP = etree.XPath('//table')
+    _TH_XP = etree.XPath('.//th')
+    _TR_XP = etree.XPath('.//tr')
+    _TD_XP = etree.XPath('.//td')
+    _DIV_XP = etree.XPath('.//div')
+    # Statement rows with a label cell and at least one value cell
+    _TBR_XP = etree.XPath(f'//div[{_has_class("D(tbr)")}][(.//div[{_has_class("D(tbc)")}])[2]]')
+    _TBC_XP = etree.XPath(f'.//div[{_has_class("D(tbc)")}]')
+    # Table rows with a label cell and a value cell
+    _LABEL_VALUE_ROW_XP = etree.XPath('//table//tr[.//td[2]]')
+    _HISTORY_TABLE_XPS = (
+        etree.XPath('//table[@class="W(100%) M(0)"]'),
+        etree.XPath('//table[@data-test="historical-prices"]'),
+        etree.XPath('//table[@class="table yf-1jecxey noDl hideOnPrint"]')
+    )
+    _HISTORY_HEADER_XP = etree.XPath('.//thead//th')
+    _HISTORY_ROW_XP = etree.XPath('.//tbody//tr')
+    _QUOTE_STATS_XP = etree.XPath('//div[@data-testid="quote-statistics"]//li')
+    _STAT_LABEL_XP = etree.XPath(f'.//span[{_has_class("label")}]')
+    _STAT_VALUE_XP = etree.XPath(f'.//span[{_has_class("value")}]')
     
-    def __init__(self, config: Dict[str, bool]):
+    def __init__(self, config: Dict[str, bool], session: requests.Session = None):
         self.config = config
+        self.session = session or HTTP_SESSION
         
+    @_ttl_cached(_DATA_CACHE, complete=lambda self, data: len(data) == len(self._section_fetchers()))
     def get_stock_data(self, symbol: str) -> Dict[str, Any]:
-        """Get comprehensive stock data"""
-        try:
-            data = {}
-            
-            if self.config.get('stock_price'):
-                data['current_price'] = self._get_current_price(symbol)
-                
-            if self.config.get('company_info'):
-                data['company_info'] = self._get_company_info(symbol)
-                
-            if self.config.get('analyst_recommendations'):
-                data['recommendations'] = self._get_analyst_recommendations(symbol)
-                
-            if self.config.get('income_statements'):
-                data['financials'] = self._get_income_statements(symbol)
-                
-            if self.config.get('technical_indicators'):
-                hist = self._fetch_yahoo_finance_history(symbol)
-                data['technical'] = self._calculate_technical_indicators(hist)
-                
-            return data
-            
-        except Exception as e:
-            print(f"Error fetching stock data: {str(e)}")
+        """Get comprehensive stock data, fetching the enabled sections concurrently.
+        
+        Each section is an independent Yahoo page, so they are scraped in a
+        thread pool side by side. A section that fails is left out of the result.
+        """
+        fetchers = self._section_fetchers()
+        if not fetchers:
             return {}
+        
+        data = {}
+        with ThreadPoolExecutor(max_workers=len(fetchers)) as executor:
+            futures = {key: executor.submit(fetch, symbol) for key, fetch in fetchers.items()}
+            for key, future in futures.items():
+                try:
+                    data[key] = future.result()
+                except Exception as e:
+                    print(f"Error fetching {key} for {symbol}: {str(e)}")
+        return data
+        
+    def _section_fetchers(self) -> Dict[str, Any]:
+        """Map each section enabled in the config to the method that fetches it"""
+        fetchers = {}
+        
+        if self.config.get('stock_price'):
+            fetchers['current_price'] = self._get_current_price
+            
+        if self.config.get('company_info'):
+            fetchers['company_info'] = self._get_company_info
+            
+        if self.config.get('analyst_recommendations'):
+            fetchers['recommendations'] = self._get_analyst_recommendations
+            
+        if self.config.get('income_statements'):
+            fetchers['financials'] = self._get_income_statements
+            
+        if self.config.get('technical_indicators'):
+            fetchers['technical'] = self._get_technical_indicators
+            
+        return fetchers
+    
+    def _get_technical_indicators(self, symbol: str) -> Dict[str, Any]:
+        """Fetch price history and calculate technical indicators"""
+        hist = self._fetch_yahoo_finance_history(symbol)
+        # Indicators of the flat placeholder would pass for real data
+        if hist['close'] is _FALLBACK_HISTORY['close']:
+            raise Exception(f"No price history available for {symbol}")
+        return self._calculate_technical_indicators(hist)
     
     def _get_current_price(self, symbol: str) -> float:
         """Get current stock price"""
-        url = f"https://finance.yahoo.com/quote/{symbol}"
-        headers = {
-            "User-Agent": "Mozilla/5.0"
-        }
-        
-        response = requests.get(url, headers=headers)
+        # The chart API's metadata is a few KB against ~1MB for the quote page
+        try:
+            return self._fetch_quote_price(symbol)
+        except Exception as e:
+            print(f"Chart API price failed for {symbol}, scraping quote page instead: {str(e)}")
         
-        if response.status_code != 200:
-            raise Exception(f"Failed to retrieve data: Status code {response.status_code}")
+        tree = _fetch_tree(self.session, symbol)
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        if tree is None:
+            raise Exception(f"Failed to retrieve quote page for {symbol}")
         
         # Find the current price
-        price_element = soup.find('fin-streamer', {'data-field': 'regularMarketPrice'})
-        if price_element:
+        price_element = _first(tree, self._PRICE_XP)
+        if price_element is not None:
             try:
-                return float(price_element['value'])
-            except (ValueError, KeyError):
-                return float(price_element.text.strip().replace(',', ''))
+                return float(price_element.get('value'))
+            except (ValueError, TypeError):
+                return float(_text(price_element).replace(',', ''))
         
         return 0.0
     
+    def _fetch_quote_price(self, symbol: str) -> float:
+        """Fetch the regular market price from the metadata of Yahoo's JSON chart API.
+        
+        The v7 quote endpoint needs a cookie and crumb; the v8 chart endpoint
+        doesn't, and a one-day range keeps the response small.
+        """
+        response = self.session.get(
+            f"https://query1.finance.yahoo.com/v8/finance/chart/{symbol}",
+            params={"range": "1d", "interval": "1d"},
+            timeout=_YAHOO_TIMEOUT
+        )
+        response.raise_for_status()
+        
+        return float(response.json()["chart"]["result"][0]["meta"]["regularMarketPrice"])
+    
     def _get_company_info(self, symbol: str) -> Dict[str, Any]:
         """Get detailed company information from Yahoo Finance profile page"""
         url = f"https://finance.yahoo.com/quote/{symbol}/profile"
-        headers = {
-            "User-Agent": "Mozilla/5.0"
+        
+        response = self.session.get(url, timeout=_YAHOO_TIMEOUT)
+        
+        # Raise rather than return blanks, so a failed fetch isn't cached as data
+        if response.status_code != 200:
+            raise Exception(f"Failed to retrieve data: Status code {response.status_code}")
+        
+        tree = _parse_html(response)
+        
+        # Initialize company info dictionary
+        company_info = {
+            'name': '',
+            'address': '',
+            'phone': '',
+            'website': '',
+            'sector': '',
+            'industry': '',
+            'employees': '',
+            'description': ''
         }
         
-        try:
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code != 200:
-                print(f"Failed to retrieve company info: Status code {response.status_code}")
-                return {
-                    'name': '',
-                    'address': '',
-                    'phone': '',
-                    'website': '',
-                    'sector': '',
-                    'industry': '',
-                    'employees': '',
-                    'description': ''
-                }
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Initialize company info dictionary
-            company_info = {
-                'name': '',
-                'address': '',
-                'phone': '',
-                'website': '',
-                'sector': '',
-                'industry': '',
-                'employees': '',
-                'description': ''
-            }
-            
-            # Extract company name
-            name_element = soup.find('section', {'data-testid': 'asset-profile'}).find('h3')
-            if name_element:
-                company_info['name'] = name_element.text.strip()
-            
-            # Extract address
-            address_div = soup.find('div', {'class': 'address'})
-            if address_div:
-                address_lines = address_div.find_all('div')
-                company_info['address'] = ' '.join([line.text.strip() for line in address_lines])
-            
-            # Extract phone and website
-            phone_link = soup.find('a', {'aria-label': 'phone number'})
-            if phone_link:
-                company_info['phone'] = phone_link.text.strip()
-            
-            website_link = soup.find('a', {'aria-label': 'website link'})
-            if website_link:
-                company_info['website'] = website_link.text.strip()
-            
-            # Extract sector and industry
-            sector_element = soup.find('dt', string=lambda text: 'Sector' in text if text else False)
-            if sector_element and sector_element.find_next('a'):
-                company_info['sector'] = sector_element.find_next('a').text.strip()
-            
-            industry_element = soup.find('dt', string=lambda text: 'Industry' in text if text else False)
-            if industry_element and industry_element.find_next('a'):
-                company_info['industry'] = industry_element.find_next('a').text.strip()
-            
-            # Extract employees
-            employees_element = soup.find('dt', string=lambda text: 'Full Time Employees' in text if text else False)
-            if employees_element and employees_element.find_next('strong'):
-                company_info['employees'] = employees_element.find_next('strong').text.strip()
-            
-            # Extract description
-            description_section = soup.find('section', {'data-testid': 'description'})
-            if description_section:
-                description_paragraph = description_section.find('p')
-                if description_paragraph:
-                    company_info['description'] = description_paragraph.text.strip()
-            
-            return company_info
-            
-        except Exception as e:
-            print(f"Error fetching company info: {str(e)}")
-            return {
-                'name': '',
-                'address': '',
-                'phone': '',
-                'website': '',
-                'sector': '',
-                'industry': '',
-                'employees': '',
-                'description': ''
-            }
+        # Extract company name
+        name_element = _first(tree, self._PROFILE_NAME_XP)
+        if name_element is not None:
+            company_info['name'] = _text(name_element)
+        
+        # Extract address
+        address_div = _first(tree, self._ADDRESS_XP)
+        if address_div is not None:
+            address_lines = self._DIV_XP(address_div)
+            company_info['address'] = ' '.join([_text(line) for line in address_lines])
+        
+        # Extract phone and website
+        phone_link = _first(tree, self._PHONE_XP)
+        if phone_link is not None:
+            company_info['phone'] = _text(phone_link)
+        
+        website_link = _first(tree, self._WEBSITE_XP)
+        if website_link is not None:
+            company_info['website'] = _text(website_link)
+        
+        # Extract sector, industry and employees - each value follows its <dt> label
+        company_info['sector'] = self._DT_VALUE_XP(tree, label='Sector', tag='a')
+        company_info['industry'] = self._DT_VALUE_XP(tree, label='Industry', tag='a')
+        company_info['employees'] = self._DT_VALUE_XP(tree, label='Full Time Employees', tag='strong')
+        
+        # Extract description
+        description_paragraph = _first(tree, self._DESCRIPTION_XP)
+        if description_paragraph is not None:
+            company_info['description'] = _text(description_paragraph)
+        
+        return company_info
+    
     def _get_analyst_recommendations(self, symbol: str) -> Dict[str, Any]:
         """Get analyst recommendations"""
         url = f"https://finance.yahoo.com/quote/{symbol}/analysis"
-        headers = {
-            "User-Agent": "Mozilla/5.0"
-        }
         
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, timeout=_YAHOO_TIMEOUT)
         
         if response.status_code != 200:
             raise Exception(f"Failed to retrieve data: Status code {response.status_code}")
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        tree = _parse_html(response)
         
         # Find the recommendation table
         recommendation_table = None
-        tables = soup.find_all('table')
+        tables = self._TABLE_XP(tree)
         for table in tables:
-            if table.find('th') and 'Recommendation' in table.find('th').text:
+            header = _first(table, self._TH_XP)
+            if header is not None and 'Recommendation' in header.text_content():
                 recommendation_table = table
                 break
         
-        if not recommendation_table:
+        if recommendation_table is None:
             return {}
         
         # Extract recommendation data
         recommendations = {}
-        rows = recommendation_table.find_all('tr')
+        rows = self._TR_XP(recommendation_table)
         
         for row in rows[1:]:  # Skip header row
-            cells = row.find_all('td')
+            cells = self._TD_XP(row)
             if len(cells) >= 2:
-                rating = cells[0].text.strip()
-                count = cells[1].text.strip()
+                rating = _text(cells[0])
+                count = _text(cells[1])
                 try:
                     recommendations[rating] = int(count)
                 except ValueError:
                     recommendations[rating] = 0
-        print("recommendations",recommendations)
+        logger.debug("recommendations %r", recommendations)
         return recommendations
     
     def _get_income_statements(self, symbol: str) -> Dict[str, Any]:
         """Get income statements"""
         url = f"https://finance.yahoo.com/quote/{symbol}/financials"
-        headers = {
-            "User-Agent": "Mozilla/5.0"
-        }
         
-        response = requests.get(url, headers=headers)
+        response = self.session.get(url, timeout=_YAHOO_TIMEOUT)
         
         if response.status_code != 200:
             raise Exception(f"Failed to retrieve data: Status code {response.status_code}")
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Find the income statement table
-        income_table = None
-        tables = soup.find_all('div', {'class': 'D(tbr)'})
-        
-        if not tables:
-            return {}
+        tree = _parse_html(response)
         
-        # Extract income statement data
+        # Extract income statement data, one row per line item
         financials = {}
-        for row in tables:
-            cells = row.find_all('div', {'class': 'D(tbc)'})
-            if cells and len(cells) > 1:
-                key = cells[0].text.strip()
-                values = [cell.text.strip() for cell in cells[1:]]
-                financials[key] = values
-        print("income" ,financials)
+        for row in self._TBR_XP(tree):
+            cells = [_text(cell) for cell in self._TBC_XP(row)]
+            financials[cells[0]] = cells[1:]
+        logger.debug("income %r", financials)
         return financials
     
     def _fetch_yahoo_finance_history(self, ticker, start_date=None, end_date=None):
         """
-        Fetch historical stock data from Yahoo Finance using web scraping.
+        Fetch historical stock data from Yahoo Finance.
+        
+        Uses the JSON chart API and falls back to scraping the history page if
+        the API call fails.
         
         Args:
             ticker (str): Stock ticker symbol (e.g., 'AAPL')
@@ -289,7 +532,9 @@ class EnhancedYFinanceTools:
             end_date (str, optional): End date in format 'YYYY-MM-DD'
         
         Returns:
-            pandas.DataFrame: Historical stock data
+            dict: Historical stock data as NumPy arrays, oldest day first - 'date'
+                plus whichever of 'open', 'high', 'low', 'close', 'adj_close'
+                and 'volume' are available ('date', 'close' and 'volume' always are)
         """
         try:
             # Convert dates to UNIX timestamp if provided
@@ -301,87 +546,80 @@ class EnhancedYFinanceTools:
                 end_timestamp = int(datetime.strptime(end_date, '%Y-%m-%d').timestamp())
                 params['period2'] = end_timestamp
             else:
-                # Current time if end_date not provided
-                params['period2'] = int(datetime.now().timestamp())
+                # End of today if end_date not provided - a whole-day bound keeps
+                # the URL, and so the HTTP cache entry, stable through the day
+                tomorrow = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+                params['period2'] = int(tomorrow.timestamp())
             
             # Default parameters
             if 'period1' not in params:
-                # Default to 1 year ago if start_date not provided
-                one_year_ago = int(datetime.now().timestamp()) - 31536000
-                params['period1'] = one_year_ago
+                # Default to 1 year before the end date if start_date not provided
+                params['period1'] = params['period2'] - 31536000
             
             params['interval'] = '1d'  # Daily data
             
+            try:
+                return self._fetch_chart_history(ticker, params)
+            except Exception as e:
+                print(f"Chart API failed for {ticker}, scraping history page instead: {str(e)}")
+            
             # Create URL
             base_url = f"https://finance.yahoo.com/quote/{ticker}/history"
             
-            # Send request with headers to mimic browser
-            headers = {
-                'User-Agent': 'Mozilla/5.0 '
-            }
-            
-            print(f"Fetching data from: {base_url}")
-            response = requests.get(base_url, params=params, headers=headers)
+            logger.debug("Fetching data from: %s", base_url)
+            response = self.session.get(base_url, params=params, timeout=_YAHOO_TIMEOUT)
             
             if response.status_code != 200:
                 print(f"Failed to fetch data: Status code {response.status_code}")
-                # Return a minimal DataFrame with the necessary columns as fallback
-                return pd.DataFrame({
-                    'Date': pd.date_range(end=datetime.now(), periods=100),
-                    'Close': [100.0] * 100,
-                    'Volume': [1000000] * 100
-                })
+                # Return a minimal history with the necessary columns as fallback
+                return _fallback_history()
             
             # Parse HTML
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Find the data table using the specific class
-            data_table = soup.find('table', {'class': 'W(100%) M(0)'})
+            tree = _parse_html(response)
             
-            if not data_table:
-                data_table = soup.find('table', {'data-test': 'historical-prices'})
-                
-            if not data_table:
-                data_table = soup.find('table', {'class': 'table yf-1jecxey noDl hideOnPrint'})
+            # Find the data table, trying each known page layout in turn
+            data_table = None
+            for table_xp in self._HISTORY_TABLE_XPS:
+                data_table = _first(tree, table_xp)
+                if data_table is not None:
+                    break
             
-            if not data_table:
+            if data_table is None:
                 print("Could not find historical data table on the page")
-                # Return a minimal DataFrame with the necessary columns as fallback
-                return pd.DataFrame({
-                    'Date': pd.date_range(end=datetime.now(), periods=100),
-                    'Close': [100.0] * 100,
-                    'Volume': [1000000] * 100
-                })
+                # Return a minimal history with the necessary columns as fallback
+                return _fallback_history()
             
             # Extract table headers
             headers = []
-            header_row = data_table.find('thead').find_all('th')
+            header_row = self._HISTORY_HEADER_XP(data_table)
             for header in header_row:
-                headers.append(header.text.strip())
+                headers.append(_text(header))
             
             # Extract table data
             rows = []
-            data_rows = data_table.find('tbody').find_all('tr')
+            data_rows = self._HISTORY_ROW_XP(data_table)
             
             for row in data_rows:
-                cols = row.find_all('td')
+                cols = self._TD_XP(row)
                 if len(cols) >= 6:  # Make sure it's a data row, not a dividend row
                     row_data = []
                     for col in cols:
-                        row_data.append(col.text.strip())
+                        row_data.append(_text(col))
                     rows.append(row_data)
             
-            # Create DataFrame
-            df = pd.DataFrame(rows, columns=headers)
+            # Create DataFrame, coercing the numeric columns while they are built
+            columns = {}
+            for i, header in enumerate(headers):
+                values = [row[i] for row in rows]
+                if header.startswith(_NUMERIC_HEADERS):
+                    values = np.array([_parse_number(value) for value in values], dtype=np.float64)
+                columns[header] = values
+            df = pd.DataFrame(columns)
             
             if df.empty:
                 print("No data rows found in the table")
-                # Return a minimal DataFrame with the necessary columns as fallback
-                return pd.DataFrame({
-                    'Date': pd.date_range(end=datetime.now(), periods=100),
-                    'Close': [100.0] * 100,
-                    'Volume': [1000000] * 100
-                })
+                # Return a minimal history with the necessary columns as fallback
+                return _fallback_history()
             
             # Convert data types
             if 'Date' in df.columns:
@@ -398,93 +636,89 @@ class EnhancedYFinanceTools:
                         # Last resort - create a date range
                         df['Date'] = pd.date_range(end=datetime.now(), periods=len(df))
             
-            # Handle numeric columns
-            numeric_columns = ['Open', 'High', 'Low', 'Close*', 'Adj Close**', 'Volume']
-            for col in numeric_columns:
-                if col in df.columns:
-                    # Remove commas and convert to float
-                    df[col] = df[col].replace('-', '0')  # Replace dash with 0
-                    df[col] = df[col].str.replace(',', '')
-                    df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            # Special handling for column names that may contain descriptions
-            adj_close_col = None
-            for col in df.columns:
-                if col.startswith('Adj Close'):
-                    adj_close_col = col
-                    break
-            
-            close_col = None
-            for col in df.columns:
-                if col.startswith('Close') and col != 'Close':
-                    close_col = col
-                    break
-            
-            # Create standardized Close and Adj Close columns
-            if adj_close_col:
-                df['Adj Close'] = df[adj_close_col].astype(float)
-            
-            if close_col:
-                df['Close'] = df[close_col].astype(float)
-            
-            # If we have all the necessary columns, drop the redundant ones
-            if 'Close' in df.columns and 'Adj Close' in df.columns:
-                # Find the indices to drop
-                drop_cols = []
-                for i, col in enumerate(df.columns):
-                    if (col.startswith('Close') and col != 'Close') or (col.startswith('Adj Close') and col != 'Adj Close'):
-                        drop_cols.append(i)
-                
-                if drop_cols:
-                    df = df.drop(df.columns[drop_cols], axis=1, errors='ignore')
+            # Headers may carry descriptions ("Close Close price adjusted for
+            # splits.", "Adj Close**") - map each standard name to its header
+            col_map = {
+                ('Adj Close' if col.startswith('Adj Close') else col.split()[0].rstrip('*')): col
+                for col in df.columns
+            }
+            df.rename(columns={col: name for name, col in col_map.items()}, inplace=True)
             
             # Ensure we have the Close column
             if 'Close' not in df.columns and 'Adj Close' in df.columns:
                 df['Close'] = df['Adj Close']
             
-            print(df.head())
-            return df
+            # The page lists the newest day first, indicators expect oldest first
+            if 'Date' in df.columns:
+                df = df.sort_values('Date', ignore_index=True)
+            
+            logger.debug("history head:\n%s", df.head())
+            return _frame_to_history(df)
             
         except Exception as e:
             print(f"Error in fetch_yahoo_finance_history: {str(e)}")
-            # Return a minimal DataFrame with the necessary columns
-            return pd.DataFrame({
-                'Date': pd.date_range(end=datetime.now(), periods=100),
-                'Close': [100.0] * 100,
-                'Volume': [1000000] * 100
-            })
-            
-    def _calculate_technical_indicators(self, data: pd.DataFrame) -> Dict[str, Any]:
+            # Return a minimal history with the necessary columns
+            return _fallback_history()
+            
+    def _fetch_chart_history(self, ticker: str, params: Dict[str, Any]) -> Dict[str, np.ndarray]:
+        """Fetch daily history from Yahoo's JSON chart API, oldest day first"""
+        response = self.session.get(
+            f"https://query1.finance.yahoo.com/v8/finance/chart/{ticker}",
+            params=params,
+            timeout=_YAHOO_TIMEOUT
+        )
+        response.raise_for_status()
+        
+        result = response.json()["chart"]["result"][0]
+        quote = result["indicators"]["quote"][0]
+        adj_close = result["indicators"].get("adjclose", [{}])[0].get("adjclose")
+        
+        # Yahoo pads halted days and the still-open session with nulls
+        close = np.array(quote["close"], dtype=np.float64)
+        keep = ~np.isnan(close)
+        
+        history = {
+            'date': np.array(result["timestamp"], dtype='datetime64[s]')[keep],
+            'open': np.array(quote["open"], dtype=np.float64)[keep],
+            'high': np.array(quote["high"], dtype=np.float64)[keep],
+            'low': np.array(quote["low"], dtype=np.float64)[keep],
+            'close': close[keep],
+            'volume': np.array(quote["volume"], dtype=np.float64)[keep]
+        }
+        if adj_close:
+            history['adj_close'] = np.array(adj_close, dtype=np.float64)[keep]
+        return history
+            
+    def _calculate_technical_indicators(self, history: Dict[str, np.ndarray]) -> Dict[str, Any]:
         """Calculate technical indicators"""
         try:
-            # Calculate RSI
-            delta = data['Close'].diff()
-            gain = (delta.where(delta > 0, 0)).rolling(window=14).mean()
-            loss = (-delta.where(delta < 0, 0)).rolling(window=14).mean()
-            rs = gain / loss
-            rsi = 100 - (100 / (1 + rs))
-            
-            # Calculate MACD
-            exp1 = data['Close'].ewm(span=12, adjust=False).mean()
-            exp2 = data['Close'].ewm(span=26, adjust=False).mean()
-            macd = exp1 - exp2
-            signal = macd.ewm(span=9, adjust=False).mean()
-            
-            # print({
-            #     'rsi': float(rsi.iloc[-1]) if not rsi.empty else 0.0,
-            #     'macd': float(macd.iloc[-1]) if not macd.empty else 0.0,
-            #     'macd_signal': float(signal.iloc[-1]) if not signal.empty else 0.0,
-            #     'sma_50': float(data['Close'].rolling(window=50).mean().iloc[-1]) if len(data) >= 50 else 0.0,
-            #     'sma_200': float(data['Close'].rolling(window=200).mean().iloc[-1]) if len(data) >= 200 else 0.0
-            # })
+            # Only the latest value of each indicator is reported, so work on the
+            # raw closes and the tail each indicator needs rather than full Series
+            close = np.ascontiguousarray(history['close'], dtype=np.float64)
+            close = close[~np.isnan(close)]
+            
+            # Calculate RSI from the simple average gain/loss of the last 14 changes
+            rsi = 0.0
+            if len(close):
+                # With under 15 closes the first one has no prior change, which counts as 0
+                window = close[-15:] if len(close) >= 15 else np.concatenate((close[:1], close))
+                delta = np.diff(window)
+                gain = np.where(delta > 0, delta, 0.0).mean() if len(delta) >= 14 else np.nan
+                loss = np.where(delta < 0, -delta, 0.0).mean() if len(delta) >= 14 else np.nan
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    rsi = 100 - (100 / (1 + gain / loss))
+            
+            # Calculate MACD - the EMA recurrence needs the whole series
+            macd = _ewma(close, 2 / (12 + 1)) - _ewma(close, 2 / (26 + 1))
+            signal = _ewma(macd, 2 / (9 + 1))
             
             # Return numerical values (not strings) to avoid formatting issues in app.py
             return {
-                'rsi': float(rsi.iloc[-1]) if not rsi.empty else 0.0,
-                'macd': float(macd.iloc[-1]) if not macd.empty else 0.0,
-                'macd_signal': float(signal.iloc[-1]) if not signal.empty else 0.0,
-                'sma_50': float(data['Close'].rolling(window=50).mean().iloc[-1]) if len(data) >= 50 else 0.0,
-                'sma_200': float(data['Close'].rolling(window=200).mean().iloc[-1]) if len(data) >= 200 else 0.0
+                'rsi': float(rsi),
+                'macd': float(macd[-1]) if len(macd) else 0.0,
+                'macd_signal': float(signal[-1]) if len(signal) else 0.0,
+                'sma_50': float(close[-50:].mean()) if len(close) >= 50 else 0.0,
+                'sma_200': float(close[-200:].mean()) if len(close) >= 200 else 0.0
             }
             
         except Exception as e:
@@ -499,6 +733,34 @@ class EnhancedYFinanceTools:
                 'sma_200': 0.0
             }
         
+    def get_all(self, symbol: str) -> Dict[str, Any]:
+        """Get stock data, fundamentals and key ratios for a symbol in one call.
+        
+        The three pages are scraped concurrently and returned as dictionaries,
+        so callers don't have to round-trip through the JSON tools.
+        
+        Args:
+            symbol (str): The stock symbol (e.g., 'AAPL').
+            
+        Returns:
+            dict: The get_stock_data result plus 'fundamentals' and 'key_ratios'.
+                A section that fails to load is returned empty.
+        """
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            stock_data = executor.submit(self.get_stock_data, symbol)
+            fundamentals = executor.submit(self._fetch_stock_fundamentals, symbol)
+            ratios = executor.submit(self._fetch_key_financial_ratios, symbol)
+            
+            combined_data = dict(stock_data.result())
+            for key, future in (('fundamentals', fundamentals), ('key_ratios', ratios)):
+                try:
+                    combined_data[key] = future.result()
+                except Exception as e:
+                    print(f"Error fetching {key} for {symbol}: {str(e)}")
+                    combined_data[key] = {}
+            
+            return combined_data
+        
     def get_stock_fundamentals(self, symbol: str) -> str:
         """Use this function to get comprehensive fundamental data for a given stock symbol using web scraping.
 
@@ -509,41 +771,10 @@ class EnhancedYFinanceTools:
             str: A JSON string containing fundamental data or an error message.
         """
         try:
-            # Construct the URLs for different pages
-            summary_url = f"https://finance.yahoo.com/quote/{symbol}"
-           
-            
-            # Use a proper User-Agent to avoid being blocked
-            headers = {
-                "User-Agent": "Mozilla/5.0"
-            }
-            
-            # Initialize the fundamentals dictionary
-            fundamentals = {}
-            
-            # Get additional data from summary page
-            summary_response = requests.get(summary_url, headers=headers)
-            if summary_response.status_code == 200:
-                summary_soup = BeautifulSoup(summary_response.text, 'html.parser')
-                
-                # Try to extract any missing important metrics
-                quote_statistics = summary_soup.find('div', {'data-testid': 'quote-statistics'})
-                if quote_statistics:
-                    stats_items = quote_statistics.find_all('li')
-                    for item in stats_items:
-                        label_elem = item.find('span', {'class': 'label'})
-                        value_elem = item.find('span', {'class': 'value'})
-                        if label_elem and value_elem:
-                            label = label_elem.get('title') or label_elem.text.strip()
-                            value = value_elem.text.strip()
-                            fundamentals[label] = value
-            
-            return json.dumps(fundamentals, indent=2)
-        
+            return _to_json(self._fetch_stock_fundamentals(symbol))
         except Exception as e:
             return f"Error getting fundamentals for {symbol}: {str(e)}"
         
-        
     def get_key_financial_ratios(self, symbol: str) -> str:
         """Use this function to get key financial ratios for a given stock symbol.
         
@@ -554,40 +785,54 @@ class EnhancedYFinanceTools:
             dict: JSON containing key financial ratios.
         """
         try:
-            # Construct the URL
-            url = f"https://finance.yahoo.com/quote/{symbol}/key-statistics"
-            
-            # Use a proper User-Agent to avoid being blocked
-            headers = {
-                "User-Agent": "Mozilla/5.0"
-            }
-            
-            # Send the request
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code != 200:
-                return f"Failed to retrieve data: Status code {response.status_code}"
-            
-            # Parse the HTML content
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Initialize dictionary to store the results
-            ratios = {}
-            
-            # Find all tables with financial information
-            tables = soup.find_all('table')
-            for table in tables:
-                rows = table.find_all('tr')
-                for row in rows:
-                    cells = row.find_all('td')
-                    if len(cells) >= 2:
-                        label = cells[0].text.strip()
-                        value = cells[1].text.strip()
-                        ratios[label] = value
-            # print("get_key_financial_ratios",ratios)
-            return json.dumps(ratios, indent=2)
+            return _to_json(self._fetch_key_financial_ratios(symbol))
         except Exception as e:
             return f"Error fetching key financial ratios for {symbol}: {e}"
+        
+    @_ttl_cached(_DATA_CACHE)
+    def _fetch_stock_fundamentals(self, symbol: str) -> Dict[str, str]:
+        """Scrape the quote statistics from the summary page"""
+        # Initialize the fundamentals dictionary
+        fundamentals = {}
+        
+        # Get additional data from summary page
+        summary_tree = _fetch_tree(self.session, symbol)
+        if summary_tree is not None:
+            # Try to extract any missing important metrics
+            for item in self._QUOTE_STATS_XP(summary_tree):
+                label_elem = _first(item, self._STAT_LABEL_XP)
+                value_elem = _first(item, self._STAT_VALUE_XP)
+                if label_elem is not None and value_elem is not None:
+                    label = label_elem.get('title') or _text(label_elem)
+                    value = _text(value_elem)
+                    fundamentals[label] = value
+        
+        return fundamentals
+        
+    @_ttl_cached(_DATA_CACHE)
+    def _fetch_key_financial_ratios(self, symbol: str) -> Dict[str, str]:
+        """Scrape every label/value row from the key statistics page"""
+        # Construct the URL
+        url = f"https://finance.yahoo.com/quote/{symbol}/key-statistics"
+        
+        # Send the request
+        response = self.session.get(url, timeout=_YAHOO_TIMEOUT)
+        
+        if response.status_code != 200:
+            raise Exception(f"Failed to retrieve data: Status code {response.status_code}")
+        
+        # Parse the HTML content
+        tree = _parse_html(response)
+        
+        # Initialize dictionary to store the results
+        ratios = {}
+        
+        # Every label/value row across the page's tables
+        for row in self._LABEL_VALUE_ROW_XP(tree):
+            cells = self._TD_XP(row)
+            ratios[_text(cells[0])] = _text(cells[1])
+        # print("get_key_financial_ratios",ratios)
+        return ratios
 
 def save_to_csv(df, filename):
     """Save DataFrame to CSV file"""